@@ -1,6 +1,29 @@
+import functools
 import itertools
+import logging
 import random
-import copy
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def build_neighbours(height, width):
+    """
+    Returns a tuple, indexed by i * width + j, holding the frozenset of
+    cells within one row and column of (i, j), not including (i, j) itself.
+
+    Tables are cached per board size and shared, so they are immutable.
+    """
+    return tuple(
+        frozenset(
+            (i + di, j + dj)
+            for di in (-1, 0, 1)
+            for dj in (-1, 0, 1)
+            if (di or dj) and 0 <= i + di < height and 0 <= j + dj < width
+        )
+        for i in range(height)
+        for j in range(width)
+    )
 
 
 class Minesweeper():
@@ -16,20 +39,20 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = [[False] * self.width for _ in range(self.height)]
+
+        # Add mines randomly, drawing distinct cells in a single pass
+        for index in random.sample(range(height * width), mines):
+            i, j = divmod(index, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Count the mines around every cell once, up front
+        neighbours = build_neighbours(height, width)
+        self.counts = [[0] * self.width for _ in range(self.height)]
+        for i, j in self.mines:
+            for ni, nj in neighbours[i * width + j]:
+                self.counts[ni][nj] += 1
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -59,24 +82,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self.counts[i][j]
 
     def won(self):
         """
@@ -97,11 +104,23 @@ class Sentence():
         self.count = count
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        if not isinstance(other, Sentence):
+            return NotImplemented
+        # Compare the counts first, as that's cheaper than comparing sets
+        return self.count == other.count and self.cells == other.cells
+
+    def __hash__(self):
+        return hash(self.key())
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable snapshot of the sentence's current value.
+        """
+        return (frozenset(self.cells), self.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -138,6 +157,22 @@ class Sentence():
         if cell in self.cells:
             self.cells.remove(cell)
 
+    def mark_mines(self, cells):
+        """
+        Updates internal knowledge representation given the fact that
+        all of the given cells are known to be mines.
+        """
+        overlap = self.cells.intersection(cells)
+        self.cells -= overlap
+        self.count -= len(overlap)
+
+    def mark_safes(self, cells):
+        """
+        Updates internal knowledge representation given the fact that
+        all of the given cells are known to be safe.
+        """
+        self.cells.difference_update(cells)
+
 
 class MinesweeperAI():
     """
@@ -150,6 +185,9 @@ class MinesweeperAI():
         self.height = height
         self.width = width
 
+        # Precompute the neighbours of every cell
+        self.neighbours = build_neighbours(height, width)
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -157,26 +195,87 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
+        # Cells known to be safe that have not been chosen yet
+        self.safe_moves = set()
+
+        # Cells not yet chosen and not known to be mines
+        self.candidates = {
+            (i, j) for i in range(self.height) for j in range(self.width)
+        }
+
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Sentences in the knowledge base that mention each cell
+        self.sentences_by_cell = {}
+
+        # Keys of the sentences in the knowledge base, for duplicate checks
+        self.knowledge_keys = set()
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mark_mines((cell,))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.mark_safes((cell,))
+
+    def mark_mines(self, cells):
+        """
+        Marks each of the given cells as a mine, and updates
+        all knowledge that mentions any of them.
+        """
+        # Sentences never mention a known cell, so there's nothing to update
+        cells = set(cells).difference(self.mines)
+        if not cells:
+            return
+        self.mines |= cells
+        self.candidates -= cells
+        for sentence in self.pop_sentences(cells):
+            self.knowledge_keys.discard(sentence.key())
+            sentence.mark_mines(cells)
+            self.knowledge_keys.add(sentence.key())
+
+    def mark_safes(self, cells):
+        """
+        Marks each of the given cells as safe, and updates
+        all knowledge that mentions any of them.
+        """
+        # Sentences never mention a known cell, so there's nothing to update
+        cells = set(cells).difference(self.safes)
+        if not cells:
+            return
+        self.safes |= cells
+        self.safe_moves |= cells.difference(self.moves_made)
+        for sentence in self.pop_sentences(cells):
+            self.knowledge_keys.discard(sentence.key())
+            sentence.mark_safes(cells)
+            self.knowledge_keys.add(sentence.key())
+
+    def pop_sentences(self, cells):
+        """
+        Removes the given cells from sentences_by_cell and returns
+        the distinct sentences that were indexed under them.
+        """
+        sentences = {}
+        for cell in cells:
+            for sentence in self.sentences_by_cell.pop(cell, ()):
+                sentences[id(sentence)] = sentence
+        return sentences.values()
+
+    def mark_move_made(self, cell):
+        """
+        Records a cell as a move that has been made.
+        """
+        self.moves_made.add(cell)
+        self.safe_moves.discard(cell)
+        self.candidates.discard(cell)
 
     def add_knowledge(self, cell, count):
         """
@@ -193,10 +292,10 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        print("Adding knowledge-----------------------------------------------")
+        logger.debug("Adding knowledge-----------------------------------------------")
 
         # Mark the cell as a move that has been made
-        self.moves_made.add(cell)
+        self.mark_move_made(cell)
         
         # Mark the cell as safe
         self.mark_safe(cell)
@@ -208,38 +307,43 @@ class MinesweeperAI():
         new_sentence = Sentence(self.get_neighbouring_cells(cell), count)
         
         # Remove cells known to be safe or mines
-        for mine_cell in self.mines:
-            new_sentence.mark_mine(mine_cell)
-        for safe_cell in self.safes:
-            new_sentence.mark_safe(safe_cell)
-        
-        self.knowledge.append(new_sentence)
-        print(f"Adding {new_sentence} based on neighbouring cells")
+        new_sentence.mark_mines(self.mines)
+        new_sentence.mark_safes(self.safes)
+
+        # If every remaining neighbour is safe, or every one is a mine,
+        # mark them directly rather than adding a sentence to reason over
+        if new_sentence.count == 0:
+            self.mark_safes(new_sentence.cells)
+            logger.debug("All neighbouring cells in %s are safe", new_sentence)
+        elif len(new_sentence.cells) == new_sentence.count:
+            self.mark_mines(new_sentence.cells)
+            logger.debug("All neighbouring cells in %s are mines", new_sentence)
+        else:
+            self.add_sentence(new_sentence)
+            logger.debug("Adding %s based on neighbouring cells", new_sentence)
         
         # Print statements to test logic
         self.show_current_knowledge()
 
-        # Run the following repeatedly until no changes detected:
+        # Run the following repeatedly until no changes detected.
+        # This terminates: each pass either marks a new cell, drops an empty
+        # sentence, or adds a sentence not already known, and there are
+        # only finitely many distinct sentences over the board's cells.
         while True:
-            starting_knowledge = copy.deepcopy(self.knowledge)
             # 4) Mark any additional cells as safe or as mines
             # if it can be concluded based on the AI's knowledge base
-            self.refresh_knowledge()
-            self.remove_stale_sentences()
+            changed = self.refresh_knowledge()
+            changed |= self.remove_stale_sentences()
             # 5) add any new sentences to the AI's knowledge base
             # if they can be inferred from existing knowledge
-            self.infer_new_sentences()
+            changed |= self.infer_new_sentences()
             # If no changes made to knowledge, then everything is up to date
-            if self.knowledge == starting_knowledge:
+            if not changed:
                 break
             # Print statements to test logic
-            print("Completed Loop")
-            print("Reprinting knowledge after updating sentences--------------")
+            logger.debug("Completed Loop")
+            logger.debug("Reprinting knowledge after updating sentences--------------")
             self.show_current_knowledge()
-            
-            # Stop loop if going to be infinite
-            if len(self.knowledge) > 50:
-                break
 
     def make_safe_move(self):
         """
@@ -250,13 +354,8 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        available_moves = self.safes.difference(self.moves_made)
-        if available_moves:
-            # random choice can't work on a set, so convert to list
-            available_moves = list(available_moves)
-            return random.choice(available_moves)
-        else:
-            return None
+        # Every cell in safe_moves is equally safe, so take any of them
+        return next(iter(self.safe_moves), None)
 
     def make_random_move(self):
         """
@@ -265,85 +364,106 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        
-        # Generate all available spaces
-        available_moves = set()
-        for i in range(self.height):
-            for j in range(self.width):
-                available_moves.add((i, j))
-
-        # Eliminate moves already made
-        available_moves = available_moves.difference(self.moves_made)
-        # Eliminate spaces with mines
-        available_moves = available_moves.difference(self.mines)
-        
-        # random choice can't work on a set, so convert to list
-        available_moves = list(available_moves)
-        
-        if available_moves:
-            return random.choice(available_moves)
+        if self.candidates:
+            # random choice can't work on a set, so convert to tuple
+            return random.choice(tuple(self.candidates))
         else:
             return None
 
+    def add_sentence(self, sentence):
+        """
+        Appends a sentence to the knowledge base and indexes it
+        under each of its cells.
+
+        Returns False, without adding it, if the sentence is already known.
+        """
+        key = sentence.key()
+        if key in self.knowledge_keys:
+            return False
+        self.knowledge_keys.add(key)
+        self.knowledge.append(sentence)
+        for cell in sentence.cells:
+            self.sentences_by_cell.setdefault(cell, []).append(sentence)
+        return True
+
     def show_current_knowledge(self):
-        print(f"Known mines: {self.mines}")
-        print(f"Known safes: {self.safes}")
-        if self.knowledge:
-            for position, sentence in enumerate(self.knowledge):
-                print(f"Knowledge {position}: {sentence}")
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug("Known mines: %s", self.mines)
+        logger.debug("Known safes: %s", self.safes)
+        for position, sentence in enumerate(self.knowledge):
+            logger.debug("Knowledge %d: %s", position, sentence)
 
     def refresh_knowledge(self):
         """
         4) Mark any additional cells as safe or as mines
         if it can be concluded based on the AI's knowledge base
+
+        Returns True if any cell was marked.
         """
-        starting_knowledge = copy.deepcopy(self.knowledge)
-        for sentence in starting_knowledge:
-            for known_mine in sentence.known_mines():
-                self.mark_mine(known_mine)
-                print(f"Adjusting {sentence} for known mine {known_mine}")
-            for known_safe in sentence.known_safes():
-                self.mark_safe(known_safe)
-                print(f"Adjusting {sentence} for known safe {known_safe}")
+        # Collect conclusions first, since marking cells mutates sentences
+        ready_mines = set()
+        ready_safes = set()
+        for sentence in self.knowledge:
+            ready_mines.update(sentence.known_mines())
+            ready_safes.update(sentence.known_safes())
+        if not ready_mines and not ready_safes:
+            return False
+
+        logger.debug("Marking known mines %s", ready_mines)
+        self.mark_mines(ready_mines)
+        logger.debug("Marking known safes %s", ready_safes)
+        self.mark_safes(ready_safes)
+        return True
 
     def infer_new_sentences(self):
         """
         5) add any new sentences to the AI's knowledge base
         if they can be inferred from existing knowledge
+
+        Returns True if any new sentence was added.
         """
-        starting_knowledge = copy.deepcopy(self.knowledge)
+        changed = False
+        starting_knowledge = list(self.knowledge)
         # For each sentence, check if it's a subset of another sentence
         for sentence_1 in starting_knowledge:
             for sentence_2 in starting_knowledge:
                 # Check for subset using '<' symbol, which excludes equal sets
                 if sentence_1.cells < sentence_2.cells:
                     # If it's a subset, create a new set from the difference
-                    # and set the count equal the difference in count 
+                    # and set the count equal the difference in count
                     unique_set = sentence_2.cells.difference(sentence_1.cells)
                     new_sentence = Sentence(unique_set,
                         sentence_2.count - sentence_1.count)
                     # Prevent adding in a duplicate sentence
-                    if new_sentence not in self.knowledge:
-                        self.knowledge.append(new_sentence)
-                        print(f"New sentence inferred: {new_sentence}")
+                    if self.add_sentence(new_sentence):
+                        logger.debug("New sentence inferred: %s", new_sentence)
+                        changed = True
+        return changed
 
     def remove_stale_sentences(self):
         """
         Remove sentences that return empty sets of cells
+
+        Returns True if any sentence was removed.
+        A sentence only loses a cell when that cell's index entry is
+        dropped, so empty sentences are no longer in sentences_by_cell.
         """
-        starting_knowledge = copy.deepcopy(self.knowledge)
-        for sentence in starting_knowledge:
-            if not sentence.cells:
-                self.knowledge.remove(sentence)
-                print(f"Removing stale sentence {sentence}")
+        kept = []
+        for sentence in self.knowledge:
+            if sentence.cells:
+                kept.append(sentence)
+            else:
+                self.knowledge_keys.discard(sentence.key())
+                logger.debug("Removing stale sentence %s", sentence)
+        if len(kept) == len(self.knowledge):
+            return False
+        self.knowledge[:] = kept
+        return True
 
     def get_neighbouring_cells(self, cell):
-        neighbouring_cells = set()
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    # Prevent adding current cell to set
-                    if (i, j) == cell:
-                        continue
-                    neighbouring_cells.add((i, j))
-        return neighbouring_cells
\ No newline at end of file
+        """
+        Returns the frozenset of cells within one row and column
+        of a given cell, not including the cell itself.
+        """
+        return self.neighbours[cell[0] * self.width + cell[1]]